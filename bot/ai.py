@@ -1,15 +1,18 @@
 # This file will handle AI responses using OpenRouter API for Google Gemini
 
 import os
+import asyncio
+import functools
 import logging
-import requests
-import json
+import hashlib
+import httpx
+import orjson
+import diskcache
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from cachetools import TTLCache
 from dotenv import load_dotenv
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential_jitter
 
-# Enable logging
-logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
-)
 logger = logging.getLogger(__name__)
 
 # Load environment variables
@@ -23,85 +26,397 @@ site_name = os.getenv("SITE_NAME", "")
 if not api_key:
     logger.error("No OPENROUTER_API_KEY found in environment variables!")
 
+# Shared HTTP client for OpenRouter, created once so connections are kept alive
+# and reused across requests instead of paying a TCP+TLS handshake per call
+_headers = {
+    "Authorization": f"Bearer {api_key}",
+    "Content-Type": "application/json",
+}
+
+# Add optional headers if provided in environment variables
+if site_url:
+    _headers["HTTP-Referer"] = site_url
+if site_name:
+    _headers["X-Title"] = site_name
+
+_client = httpx.AsyncClient(
+    base_url="https://openrouter.ai/api/v1",
+    headers=_headers,
+    http2=True,
+    timeout=httpx.Timeout(30.0, connect=5.0),
+    limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+)
+
+async def close_ai_client() -> None:
+    """Close the shared OpenRouter HTTP client and disk cache. Called on application shutdown."""
+    await _client.aclose()
+    if _disk_cache is not None:
+        _disk_cache.close()
+    logger.info("Closed OpenRouter HTTP client")
+
 # Define which model to use via OpenRouter
 MODEL_NAME = 'google/gemini-2.0-pro-exp-02-05:free'  # Using Gemini Pro via OpenRouter
 
 # Define the system message for community management context
-SYSTEM_MESSAGE = """You are a Community Management Assistant for a Telegram bot serving a community focused on Systemic Altruism. 
-Your responses should be friendly, informative, and centered around community engagement, including onboarding, FAQs, event updates, and announcements. 
-Avoid generic problem-solving unless it directly relates to community management.
-Keep your responses concise and helpful for community members."""
+SYSTEM_MESSAGE = "Community Management Assistant for a Systemic Altruism Telegram community. Friendly, concise, on-topic (onboarding, FAQs, events, announcements). Skip generic advice."
+
+# Lightweight tasks are routed to a smaller, faster model with a shorter system message
+MOTIVATE_MODEL_NAME = 'google/gemini-2.0-flash-exp:free'
+MOTIVATE_SYSTEM_MESSAGE = "You write short, uplifting messages for a Systemic Altruism community on Telegram."
+
+def _system_message_entry(system_message: str) -> dict:
+    """
+    Build the system entry of a request payload. The static system prompt stays
+    first and unchanged so the provider can cache it as a prompt prefix.
+    """
+    return {
+        "role": "system",
+        "content": [
+            {
+                "type": "text",
+                "text": system_message,
+                "cache_control": {"type": "ephemeral"}
+            }
+        ]
+    }
+
+# Model and prebuilt system entry used for each kind of request. Entries are
+# built once at import and shared by every payload, so they must not be mutated.
+TASK_ROUTES = {
+    "chat": {"model": MODEL_NAME, "system": _system_message_entry(SYSTEM_MESSAGE)},
+    "motivate": {"model": MOTIVATE_MODEL_NAME, "system": _system_message_entry(MOTIVATE_SYSTEM_MESSAGE)},
+}
+
+def _get_route(task: str) -> dict:
+    """Return the model route for a task, falling back to the chat route."""
+    route = TASK_ROUTES.get(task)
+    if route is None:
+        logger.warning(f"Unknown AI task '{task}', using the chat model")
+        return TASK_ROUTES["chat"]
+    return route
+
+# In-process cache of AI responses keyed by SHA-256 of model and prompt, so
+# repeated prompts (e.g. /motivate, common FAQs) skip the OpenRouter roundtrip
+_response_cache = TTLCache(maxsize=1024, ttl=3600)
+
+# Persistent second-level cache so cached responses survive bot restarts
+AI_CACHE_DIR = os.getenv("AI_CACHE_DIR", ".ai_cache")
+DISK_CACHE_TTL = 86400  # seconds
+_disk_cache: Optional[diskcache.Cache] = None
+
+def open_disk_cache() -> None:
+    """Open the persistent response cache. Called on application startup, not at import."""
+    global _disk_cache
+    if _disk_cache is None:
+        _disk_cache = diskcache.Cache(AI_CACHE_DIR, size_limit=500_000_000)
+        logger.info(f"Opened AI response disk cache at {AI_CACHE_DIR}")
+
+def _cache_key(model: str, user_message: str) -> str:
+    """Build the response cache key for a prompt sent to a model."""
+    return hashlib.sha256(f"{model}|{user_message}".encode()).hexdigest()
+
+# Optional semantic cache: prompts whose embedding is close enough to a previous
+# prompt reuse its response. Requires sentence-transformers and faiss-cpu.
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+SEMANTIC_CACHE_MODEL = "all-MiniLM-L6-v2"
+SEMANTIC_CACHE_THRESHOLD = 0.92
+SEMANTIC_CACHE_MAX_ENTRIES = 10000
+
+_semantic_model = None
+_new_semantic_index = None
+# One index and response list per AI model, so e.g. a chat question is never
+# answered with a cached /motivate reply from the smaller model
+_semantic_caches: Dict[str, Tuple[object, List[str]]] = {}
+_semantic_disabled = False
+_semantic_lock = asyncio.Lock()
 
-async def generate_ai_response(user_message: str) -> str:
+def _load_semantic_cache() -> bool:
+    """Load the embedding model and prepare the vector index factory. Returns False if unavailable."""
+    global _semantic_model, _new_semantic_index
+    try:
+        import faiss
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        logger.error("Semantic cache is enabled but faiss/sentence-transformers are not installed")
+        return False
+    
+    try:
+        model = SentenceTransformer(SEMANTIC_CACHE_MODEL)
+        dimension = model.get_sentence_embedding_dimension()
+    except Exception as e:
+        logger.error(f"Failed to load semantic cache model {SEMANTIC_CACHE_MODEL}: {e}")
+        return False
+    
+    _semantic_model = model
+    _new_semantic_index = functools.partial(faiss.IndexFlatIP, dimension)
+    logger.info(f"Semantic cache initialized with model {SEMANTIC_CACHE_MODEL}")
+    return True
+
+async def _embed_prompt(user_message: str):
+    """Embed a prompt for the semantic cache, or return None if the cache is unavailable."""
+    global _semantic_disabled
+    if _semantic_model is None:
+        async with _semantic_lock:
+            if _semantic_disabled:
+                return None
+            if _semantic_model is None and not await asyncio.to_thread(_load_semantic_cache):
+                # Don't retry the load on every message after it has failed once
+                _semantic_disabled = True
+                return None
+    
+    # Encoding is CPU-bound, so keep it off the event loop
+    return await asyncio.to_thread(
+        _semantic_model.encode, [user_message], normalize_embeddings=True
+    )
+
+def _semantic_lookup(model: str, embedding):
+    """Return the cached response of a model for the most similar prompt above the threshold."""
+    cache = _semantic_caches.get(model)
+    if cache is None or cache[0].ntotal == 0:
+        return None
+    index, responses = cache
+    scores, ids = index.search(embedding, 1)
+    if scores[0][0] > SEMANTIC_CACHE_THRESHOLD:
+        return responses[ids[0][0]]
+    return None
+
+def _semantic_store(model: str, embedding, ai_text: str) -> None:
+    """Add a prompt embedding and a model's response to that model's semantic cache."""
+    cache = _semantic_caches.get(model)
+    if cache is None:
+        cache = _semantic_caches[model] = (_new_semantic_index(), [])
+    index, responses = cache
+    if index.ntotal >= SEMANTIC_CACHE_MAX_ENTRIES:
+        return
+    index.add(embedding)
+    responses.append(ai_text)
+
+# Fallback replies used when the AI service cannot produce an answer
+NO_API_KEY_REPLY = "Sorry, AI service is currently unavailable due to configuration issues."
+CONNECTION_ERROR_REPLY = "I'm having trouble connecting to my AI brain right now. Please try again in a moment or contact the admin if this persists."
+PARSE_ERROR_REPLY = "I received an unexpected response format. Please try again or contact the admin."
+UNEXPECTED_ERROR_REPLY = "I'm having trouble processing your request right now. Please try again in a moment."
+FALLBACK_REPLIES = frozenset((
+    NO_API_KEY_REPLY, CONNECTION_ERROR_REPLY, PARSE_ERROR_REPLY, UNEXPECTED_ERROR_REPLY
+))
+
+def _build_payload(user_message: str, route: dict, stream: bool = False) -> dict:
+    """Build the chat completion request payload for a user message."""
+    payload = {
+        "model": route["model"],
+        "messages": [route["system"], {"role": "user", "content": user_message}]
+    }
+    if stream:
+        payload["stream"] = True
+    return payload
+
+async def _lookup_cache(
+    user_message: str, route: dict, use_semantic_cache: bool
+) -> Tuple[Optional[str], str, object]:
+    """
+    Look up a prompt in the response caches.
+    
+    Returns:
+        Tuple of (cached response or None, exact cache key, prompt embedding or None)
+    """
+    # Return a cached response if this exact prompt was answered recently
+    key = _cache_key(route["model"], user_message)
+    cached = _response_cache.get(key)
+    if cached is not None:
+        logger.info("Serving AI response from cache")
+        return cached, key, None
+    
+    # Fall back to the disk cache; its calls block, so run them in a thread
+    cached = None
+    if _disk_cache is not None:
+        try:
+            cached = await asyncio.to_thread(_disk_cache.get, key)
+        except Exception as e:
+            logger.error(f"Disk cache lookup failed: {e}")
+    if cached is not None:
+        logger.info("Serving AI response from disk cache")
+        _response_cache[key] = cached
+        return cached, key, None
+    
+    embedding = None
+    if SEMANTIC_CACHE_ENABLED and use_semantic_cache and not _semantic_disabled:
+        try:
+            embedding = await _embed_prompt(user_message)
+            if embedding is not None:
+                cached = _semantic_lookup(route["model"], embedding)
+                if cached is not None:
+                    logger.info("Serving AI response from semantic cache")
+                    _response_cache[key] = cached
+                    return cached, key, None
+        except Exception as e:
+            logger.error(f"Semantic cache lookup failed: {e}")
+            embedding = None
+    
+    return None, key, embedding
+
+async def _store_cache(key: str, model: str, embedding, ai_text: str) -> None:
+    """Store a successful response in the response caches."""
+    # Only successful responses are cached; fallback messages never are
+    _response_cache[key] = ai_text
+    if embedding is not None:
+        _semantic_store(model, embedding, ai_text)
+    if _disk_cache is None:
+        return
+    try:
+        await asyncio.to_thread(_disk_cache.set, key, ai_text, expire=DISK_CACHE_TTL)
+    except Exception as e:
+        logger.error(f"Disk cache write failed: {e}")
+
+# Transient OpenRouter failures are retried with exponential backoff and jitter
+RETRYABLE_STATUS_CODES = frozenset((429, 500, 502, 503, 504))
+MAX_RETRY_ATTEMPTS = 3
+MAX_RETRY_AFTER = 10.0  # seconds; longer Retry-After values are capped
+
+_backoff = wait_exponential_jitter(initial=0.5, max=4)
+
+def _is_retryable(exc: BaseException) -> bool:
+    """Return True for network errors and retryable HTTP status codes."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in RETRYABLE_STATUS_CODES
+    return isinstance(exc, httpx.TransportError)
+
+def _retry_wait(retry_state) -> float:
+    """Wait for the server's Retry-After if given, otherwise back off exponentially."""
+    wait = _backoff(retry_state)
+    exc = retry_state.outcome.exception()
+    if isinstance(exc, httpx.HTTPStatusError):
+        retry_after = exc.response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            wait = max(wait, min(float(retry_after), MAX_RETRY_AFTER))
+    return wait
+
+@retry(
+    stop=stop_after_attempt(MAX_RETRY_ATTEMPTS),
+    wait=_retry_wait,
+    retry=retry_if_exception(_is_retryable),
+    reraise=True,
+)
+async def _send_completion(payload: dict, stream: bool = False) -> httpx.Response:
+    """
+    Send a chat completion request to OpenRouter, retrying transient failures.
+    With stream=True the body is not read yet and the caller must close the response.
+    """
+    # orjson encodes straight to bytes; Content-Type is set on the client
+    request = _client.build_request("POST", "/chat/completions", content=orjson.dumps(payload))
+    response = await _client.send(request, stream=stream)
+    if response.is_error:
+        await response.aclose()
+        response.raise_for_status()
+    return response
+
+async def generate_ai_response(
+    user_message: str, *, task: str = "chat", use_semantic_cache: bool = True
+) -> str:
     """
     Get an AI-generated response using OpenRouter API for Google Gemini.
     
     Args:
         user_message: The message from the user
+        task: Kind of request, used to pick the model (see TASK_ROUTES)
+        use_semantic_cache: Set to False for personalized prompts that must not
+            reuse answers to similar questions
         
     Returns:
         AI-generated response as a string or fallback message if API fails
     """
     if not api_key:
         logger.error("Missing OpenRouter API key - cannot generate AI response")
-        return "Sorry, AI service is currently unavailable due to configuration issues."
+        return NO_API_KEY_REPLY
+    
+    route = _get_route(task)
+    cached, key, embedding = await _lookup_cache(user_message, route, use_semantic_cache)
+    if cached is not None:
+        return cached
     
     try:
-        # Set up the headers for OpenRouter API
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json",
-        }
-        
-        # Add optional headers if provided in environment variables
-        if site_url:
-            headers["HTTP-Referer"] = site_url
-        if site_name:
-            headers["X-Title"] = site_name
-        
-        # Prepare the request payload with system message for context
-        payload = {
-            "model": MODEL_NAME,
-            "messages": [
-                {
-                    "role": "system",
-                    "content": SYSTEM_MESSAGE
-                },
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": user_message
-                        }
-                    ]
-                }
-            ]
-        }
-        
-        # Make the API request to OpenRouter
-        response = requests.post(
-            url="https://openrouter.ai/api/v1/chat/completions",
-            headers=headers,
-            data=json.dumps(payload)
-        )
-        
-        # Check if the request was successful
-        response.raise_for_status()
+        # Make the API request to OpenRouter without blocking the event loop
+        response = await _send_completion(_build_payload(user_message, route))
         
         # Parse the response
-        response_json = response.json()
+        response_json = orjson.loads(response.content)
         
         # Extract the AI-generated text from the response
         ai_text = response_json["choices"][0]["message"]["content"]
         
+        await _store_cache(key, route["model"], embedding, ai_text)
         return ai_text
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"Error making request to OpenRouter API: {e}")
-        return "I'm having trouble connecting to my AI brain right now. Please try again in a moment or contact the admin if this persists."
-    except (KeyError, IndexError) as e:
+        return CONNECTION_ERROR_REPLY
+    except (KeyError, IndexError, ValueError) as e:
         logger.error(f"Error parsing OpenRouter API response: {e}")
-        return "I received an unexpected response format. Please try again or contact the admin."
+        return PARSE_ERROR_REPLY
     except Exception as e:
         logger.error(f"Unexpected error generating AI response: {e}")
-        return "I'm having trouble processing your request right now. Please try again in a moment."
\ No newline at end of file
+        return UNEXPECTED_ERROR_REPLY
+
+async def stream_ai_response(
+    user_message: str, *, task: str = "chat", use_semantic_cache: bool = True
+) -> AsyncIterator[str]:
+    """
+    Stream an AI-generated response from OpenRouter as it is produced.
+    
+    Args:
+        user_message: The message from the user
+        task: Kind of request, used to pick the model (see TASK_ROUTES)
+        use_semantic_cache: Set to False for personalized prompts that must not
+            reuse answers to similar questions
+        
+    Yields:
+        Pieces of the response text. Cached responses are yielded in one piece,
+        and a fallback message is yielded if the API fails before any text.
+    """
+    if not api_key:
+        logger.error("Missing OpenRouter API key - cannot generate AI response")
+        yield NO_API_KEY_REPLY
+        return
+    
+    route = _get_route(task)
+    cached, key, embedding = await _lookup_cache(user_message, route, use_semantic_cache)
+    if cached is not None:
+        yield cached
+        return
+    
+    payload = _build_payload(user_message, route, stream=True)
+    parts = []
+    completed = False
+    fallback = None
+    
+    try:
+        # Retries only happen while opening the stream, before any text is yielded
+        response = await _send_completion(payload, stream=True)
+        try:
+            # Server-sent events: "data: {...}" lines, ending with "data: [DONE]"
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                data = line[6:]
+                if data == "[DONE]":
+                    completed = True
+                    break
+                
+                delta = orjson.loads(data)["choices"][0]["delta"].get("content")
+                if delta:
+                    parts.append(delta)
+                    yield delta
+        finally:
+            await response.aclose()
+    except httpx.HTTPError as e:
+        logger.error(f"Error streaming from OpenRouter API: {e}")
+        fallback = CONNECTION_ERROR_REPLY
+    except (KeyError, IndexError, ValueError) as e:
+        logger.error(f"Error parsing OpenRouter stream chunk: {e}")
+        fallback = PARSE_ERROR_REPLY
+    except Exception as e:
+        logger.error(f"Unexpected error streaming AI response: {e}")
+        fallback = UNEXPECTED_ERROR_REPLY
+    
+    if completed and parts:
+        await _store_cache(key, route["model"], embedding, "".join(parts))
+    elif not parts:
+        yield fallback or PARSE_ERROR_REPLY
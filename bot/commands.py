@@ -1,5 +1,7 @@
 # This file will handle admin commands (e.g., announcements, scheduled updates)
 
+import asyncio
+import datetime
 import logging
 import re
 from typing import Dict, Any, List, Optional, Tuple
@@ -13,13 +15,10 @@ from telegram.ext import (
     CallbackQueryHandler
 )
 from bot.database import db_manager
-from bot.utils import send_scheduled_announcement, broadcast_message
+from bot.utils import send_scheduled_announcement, broadcast_message, keep_typing, reply_streaming
 from bot.scheduler import reschedule_jobs
+from bot.motivation import get_motivation, add_motivation, random_motivate_prompt
 
-# Enable logging
-logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
-)
 logger = logging.getLogger(__name__)
 
 #------------------------------------------------------------------------------
@@ -46,6 +45,16 @@ WEEKLY_SCHEDULE = "weekly_schedule"
 CONFIRM_SCHEDULE_UPDATE = "confirm_schedule"
 CANCEL_SCHEDULE_UPDATE = "cancel_schedule"
 
+# Longest possible Telegram user ID (64-bit integer)
+MAX_USER_ID_LENGTH = 19
+
+# Precompiled time formats, e.g. "9:30 AM" and "14:30"
+_AMPM_RE = re.compile(r"(\d{1,2}):(\d{2})\s*(AM|PM)")
+_HHMM_RE = re.compile(r"^\d{1,2}:\d{2}$")
+
+# Day names indexed by the weekly_day setting (0=Sunday)
+_DAY_NAMES = ("Sunday", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday")
+
 #------------------------------------------------------------------------------
 # Helper functions
 #------------------------------------------------------------------------------
@@ -66,8 +75,8 @@ def format_time_ampm(time_24h: str) -> str:
 def parse_time_ampm(time_ampm: str) -> str:
     """Convert 12-hour AM/PM format to 24-hour format."""
     try:
-        # Regular expression to match time in format like "9:30 AM" or "12:45 PM"
-        match = re.match(r"(\d{1,2}):(\d{2})\s*(AM|PM)", time_ampm.upper())
+        # Match time in format like "9:30 AM" or "12:45 PM"
+        match = _AMPM_RE.match(time_ampm.upper())
         if not match:
             return None
             
@@ -86,6 +95,20 @@ def parse_time_ampm(time_ampm: str) -> str:
         logger.error(f"Error parsing time: {e}")
         return None
 
+def parse_user_id(text: str) -> Optional[int]:
+    """
+    Parse a Telegram user ID. Returns None if the text is not a positive integer.
+    Telegram IDs fit in 64 bits, so longer input is rejected before parsing.
+    """
+    text = text.strip()
+    if not 1 <= len(text) <= MAX_USER_ID_LENGTH:
+        return None
+    # int() also accepts signs and underscores like "+42" or "1_000", so require plain digits
+    if not (text.isascii() and text.isdigit()):
+        return None
+    user_id = int(text)
+    return user_id if user_id > 0 else None
+
 async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Cancel and end the conversation."""
     await update.message.reply_text(
@@ -94,14 +117,10 @@ async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     return ConversationHandler.END
 
 async def is_admin(update: Update) -> bool:
-    """
-    Check if the user is an admin by querying the database.
-    This function always performs a fresh database check to ensure accuracy.
-    """
+    """Check if the user is an admin."""
     user_id = update.effective_user.id
-    # Always perform a fresh database check
-    is_admin_status = db_manager.is_admin(user_id)
-    logger.info(f"Admin status check for user {user_id}: {is_admin_status}")
+    is_admin_status = await db_manager.is_admin(user_id)
+    logger.debug("Admin status check for user %s: %s", user_id, is_admin_status)
     return is_admin_status
 
 #------------------------------------------------------------------------------
@@ -159,22 +178,9 @@ async def announcement_confirmation(update: Update, context: ContextTypes.DEFAUL
         return ConversationHandler.END
     
     # Send the announcement to all users
-    users = db_manager.get_all_users()
-    success_count = 0
-    failure_count = 0
-    
-    for user in users:
-        user_id = user.get("user_id")
-        if user_id:
-            try:
-                await context.bot.send_message(
-                    chat_id=user_id,
-                    text=f"📢 ANNOUNCEMENT 📢\n\n{announcement_text}"
-                )
-                success_count += 1
-            except Exception as e:
-                logger.error(f"Failed to send announcement to user {user_id}: {e}")
-                failure_count += 1
+    success_count, failure_count = await broadcast_message(
+        context, f"📢 ANNOUNCEMENT 📢\n\n{announcement_text}"
+    )
     
     # Update the confirmation message
     await query.edit_message_text(
@@ -203,27 +209,25 @@ async def add_admin_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
 async def admin_id_input(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Process the admin ID input."""
-    admin_id_text = update.message.text.strip()
-    
     # Validate the admin ID
-    if not admin_id_text.isdigit():
+    admin_id = parse_user_id(update.message.text)
+    if admin_id is None:
         await update.message.reply_text(
             "Invalid user ID. Please enter a numeric ID."
         )
         return TYPING_ADMIN_ID
     
-    admin_id = int(admin_id_text)
     user_id = update.effective_user.id
     username = update.effective_user.username
     
     # Add the new admin
-    if db_manager.add_admin(admin_id, user_id, username):
+    if await db_manager.add_admin(admin_id, user_id, username):
         await update.message.reply_text(
             f"User with ID {admin_id} has been added as an admin."
         )
         
         # Broadcast notification to all users
-        admin_user = db_manager.get_user(admin_id)
+        admin_user = await db_manager.get_user(admin_id, {"username": 1, "_id": 0})
         admin_username = admin_user.get("username", "Unknown") if admin_user else "Unknown"
         notification_message = f"🔔 ADMIN UPDATE 🔔\n\nUser @{admin_username} (ID: {admin_id}) has been added as an admin."
         success_count, failure_count = await broadcast_message(context, notification_message)
@@ -255,17 +259,14 @@ async def remove_admin_command(update: Update, context: ContextTypes.DEFAULT_TYP
 
 async def remove_admin_id_input(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Process the admin ID input for removal."""
-    admin_id_text = update.message.text.strip()
-    
     # Validate the admin ID
-    if not admin_id_text.isdigit():
+    admin_id = parse_user_id(update.message.text)
+    if admin_id is None:
         await update.message.reply_text(
             "Invalid user ID. Please enter a numeric ID."
         )
         return TYPING_ADMIN_ID
     
-    admin_id = int(admin_id_text)
-    
     # Prevent removing yourself
     if admin_id == update.effective_user.id:
         await update.message.reply_text(
@@ -274,29 +275,38 @@ async def remove_admin_id_input(update: Update, context: ContextTypes.DEFAULT_TY
         return ConversationHandler.END
     
     # Get admin info before removal for notification
-    admin_user = db_manager.get_user(admin_id)
+    admin_user = await db_manager.get_user(admin_id, {"username": 1, "_id": 0})
     admin_username = admin_user.get("username", "Unknown") if admin_user else "Unknown"
     
     # Remove the admin
-    if db_manager.remove_admin(admin_id):
+    if await db_manager.remove_admin(admin_id):
         await update.message.reply_text(
             f"User with ID {admin_id} has been removed from admins."
         )
         
-        # Broadcast notification to all users
+        # Broadcast notification to all users and send a direct message to the
+        # removed admin at the same time, since the two are independent
         notification_message = f"🔔 ADMIN UPDATE 🔔\n\nUser @{admin_username} (ID: {admin_id}) has been removed from admin role."
-        success_count, failure_count = await broadcast_message(context, notification_message)
-        
-        # Send a direct message to the removed admin
-        try:
-            await context.bot.send_message(
+        broadcast_result, dm_result = await asyncio.gather(
+            broadcast_message(context, notification_message),
+            context.bot.send_message(
                 chat_id=admin_id,
                 text="🔔 ADMIN STATUS UPDATE 🔔\n\nYour admin privileges have been revoked. "
                      "You no longer have access to admin commands."
-            )
+            ),
+            return_exceptions=True
+        )
+        
+        if isinstance(dm_result, Exception):
+            logger.error(f"Failed to send admin removal notification to user {admin_id}: {dm_result}")
+        else:
             logger.info(f"Sent admin removal notification to user {admin_id}")
-        except Exception as e:
-            logger.error(f"Failed to send admin removal notification to user {admin_id}: {e}")
+        
+        if isinstance(broadcast_result, Exception):
+            logger.error(f"Failed to broadcast admin removal notification: {broadcast_result}")
+            success_count, failure_count = 0, 0
+        else:
+            success_count, failure_count = broadcast_result
         
         await update.message.reply_text(
             f"Notification sent to {success_count} users. ({failure_count} failed)"
@@ -329,24 +339,25 @@ async def list_admins_command(update: Update, context: ContextTypes.DEFAULT_TYPE
         )
         return
     
-    # Get all admins
-    admins = db_manager.get_all_admins()
-    
-    if not admins:
-        await update.message.reply_text("No admins found in the database.")
-        return
-    
-    # Format the admin list
+    # Format the admin list while streaming admins from the database
     admin_list = "📋 Admin List:\n\n"
-    for i, admin in enumerate(admins, 1):
+    i = 0
+    async for admin in db_manager.get_all_admins():
+        i += 1
         admin_id = admin.get("user_id", "Unknown")
         added_at = admin.get("added_at", "Unknown")
+        if isinstance(added_at, datetime.datetime):
+            added_at = added_at.strftime("%Y-%m-%d %H:%M UTC")
         added_by = admin.get("added_by", "Unknown")
         
         admin_list += f"{i}. Admin ID: {admin_id}\n"
         admin_list += f"   Added at: {added_at}\n"
         admin_list += f"   Added by: {added_by}\n\n"
     
+    if i == 0:
+        await update.message.reply_text("No admins found in the database.")
+        return
+    
     await update.message.reply_text(admin_list)
 
 # Define the handler
@@ -429,7 +440,7 @@ async def time_input(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         # Try to parse as 24-hour format directly
         try:
             # Check if it matches HH:MM format
-            if re.match(r"^\d{1,2}:\d{2}$", time_input):
+            if _HHMM_RE.match(time_input):
                 hour, minute = map(int, time_input.split(':'))
                 if 0 <= hour < 24 and 0 <= minute < 60:
                     time_24h = f"{hour:02d}:{minute:02d}"
@@ -485,6 +496,31 @@ async def day_input(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     await query.edit_message_text("Day selected. Preparing confirmation...")
     return await show_schedule_confirmation(update, context)
 
+def _format_daily_confirmation(announcement_message: str, time_display: str, day: Optional[int]) -> str:
+    """Format the confirmation message for a daily schedule."""
+    return (
+        f"📅 Daily Announcement Settings:\n\n"
+        f"⏰ Time: {time_display}\n"
+        f"📝 Message:\n{announcement_message}\n\n"
+        f"Do you want to save these settings?"
+    )
+
+def _format_weekly_confirmation(announcement_message: str, time_display: str, day: Optional[int]) -> str:
+    """Format the confirmation message for a weekly schedule."""
+    return (
+        f"📅 Weekly Announcement Settings:\n\n"
+        f"📆 Day: {_DAY_NAMES[day]}\n"
+        f"⏰ Time: {time_display}\n"
+        f"📝 Message:\n{announcement_message}\n\n"
+        f"Do you want to save these settings?"
+    )
+
+# Confirmation message formatter for each schedule type
+_SCHEDULE_FORMATTERS = {
+    DAILY_SCHEDULE: _format_daily_confirmation,
+    WEEKLY_SCHEDULE: _format_weekly_confirmation,
+}
+
 async def show_schedule_confirmation(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Show the schedule confirmation."""
     schedule_type = context.user_data.get("schedule_type")
@@ -496,24 +532,7 @@ async def show_schedule_confirmation(update: Update, context: ContextTypes.DEFAU
     time_display = format_time_ampm(time_24h)
     
     # Create the confirmation message
-    if schedule_type == DAILY_SCHEDULE:
-        confirmation_message = (
-            f"📅 Daily Announcement Settings:\n\n"
-            f"⏰ Time: {time_display}\n"
-            f"📝 Message:\n{announcement_message}\n\n"
-            f"Do you want to save these settings?"
-        )
-    else:  # WEEKLY_SCHEDULE
-        day_names = ["Sunday", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
-        day_name = day_names[day]
-        
-        confirmation_message = (
-            f"📅 Weekly Announcement Settings:\n\n"
-            f"📆 Day: {day_name}\n"
-            f"⏰ Time: {time_display}\n"
-            f"📝 Message:\n{announcement_message}\n\n"
-            f"Do you want to save these settings?"
-        )
+    confirmation_message = _SCHEDULE_FORMATTERS[schedule_type](announcement_message, time_display, day)
     
     # Create confirmation keyboard
     keyboard = [
@@ -556,12 +575,12 @@ async def schedule_confirmation(update: Update, context: ContextTypes.DEFAULT_TY
     # Update the database based on schedule type
     success = False
     if schedule_type == DAILY_SCHEDULE:
-        success = db_manager.update_schedule_settings(
+        success = await db_manager.update_schedule_settings(
             daily_time=time_24h,
             daily_message=announcement_message
         )
     else:  # WEEKLY_SCHEDULE
-        success = db_manager.update_schedule_settings(
+        success = await db_manager.update_schedule_settings(
             weekly_time=time_24h,
             weekly_day=day,
             weekly_message=announcement_message
@@ -569,7 +588,7 @@ async def schedule_confirmation(update: Update, context: ContextTypes.DEFAULT_TY
     
     if success:
         # Reschedule the jobs
-        if reschedule_jobs(context.application):
+        if await reschedule_jobs(context.application):
             await query.edit_message_text("✅ Schedule settings updated successfully!")
         else:
             await query.edit_message_text(
@@ -632,28 +651,34 @@ announcement_handler = ConversationHandler(
 #------------------------------------------------------------------------------
 
 async def motivate_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Generate and send a motivational message to the user."""
+    """Send a motivational message to the user."""
     try:
-        # Send typing action to show the bot is processing
-        await context.bot.send_chat_action(chat_id=update.effective_chat.id, action="typing")
+        # Serve a message from the pool once it is warm, without calling the LLM
+        motivational_message = get_motivation()
+        if motivational_message is not None:
+            await update.message.reply_text(
+                f"✨ *Daily Motivation* ✨\n\n{motivational_message}",
+                parse_mode="Markdown"
+            )
+            return
         
         # Import the AI generation function
-        from bot.ai import generate_ai_response
-        
-        # Create a prompt for a motivational message
-        prompt = "Generate a short, uplifting motivational message to inspire community members. Keep it concise, positive, and energizing."
-        
-        # Generate the motivational message using the AI
-        motivational_message = await generate_ai_response(prompt)
+        from bot.ai import stream_ai_response
         
-        # Format the message with emojis for better presentation
-        formatted_message = f"✨ *Daily Motivation* ✨\n\n{motivational_message}"
+        # Stream the motivational message, formatted with emojis for better
+        # presentation, showing the typing indicator while it is generated
+        async with keep_typing(context.bot, update.effective_chat.id):
+            motivational_message = await reply_streaming(
+                update.message,
+                stream_ai_response(
+                    random_motivate_prompt(), task="motivate", use_semantic_cache=False
+                ),
+                prefix="✨ *Daily Motivation* ✨\n\n",
+                parse_mode="Markdown"
+            )
         
-        # Send the motivational message to the user
-        await update.message.reply_text(
-            formatted_message,
-            parse_mode="Markdown"
-        )
+        # Grow the pool so later requests can be served without the LLM
+        add_motivation(motivational_message)
         
         # Log the successful generation
         logger.info(f"Motivational message generated for user {update.effective_user.id}")
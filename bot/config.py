@@ -1,7 +1,9 @@
 # This File will store the bot token and any important settings.
 
 import os
-from typing import List
+import datetime
+from typing import FrozenSet, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -13,7 +15,7 @@ DEFAULT_ADMIN_ID = os.getenv("DEFAULT_ADMIN_ID", "")
 # Scheduled announcement default settings
 # These are only used as fallbacks if database settings are unavailable
 DEFAULT_DAILY_TIME = "09:00"  # Format: HH:MM
-DEFAULT_WEEKLY_DAY = 1  # 0=Monday, 6=Sunday
+DEFAULT_WEEKLY_DAY = 1  # Monday; 0=Sunday, 6=Saturday, as in PTB's run_daily(days=...)
 DEFAULT_WEEKLY_TIME = "10:00"  # Format: HH:MM
 
 # Check if default admin ID is configured
@@ -23,12 +25,50 @@ if not DEFAULT_ADMIN_ID:
 # Get admin IDs from environment variables
 # Format in .env file: ADMIN_IDS=123456789,987654321
 admin_ids_str = os.getenv("ADMIN_IDS", "")
-ADMIN_IDS = [int(id_str) for id_str in admin_ids_str.split(",") if id_str.strip().isdigit()]
+ADMIN_IDS: FrozenSet[int] = frozenset(
+    int(id_str) for id_str in admin_ids_str.split(",") if id_str.strip().isdigit()
+)
+
+def _parse_hour_minute(time_str: str, default: str) -> Tuple[int, int]:
+    """Parse an HH:MM string into an (hour, minute) tuple, falling back to default."""
+    try:
+        hour, minute = map(int, time_str.split(":"))
+        if 0 <= hour <= 23 and 0 <= minute <= 59:
+            return hour, minute
+    except ValueError:
+        pass
+    print(f"Warning: Invalid time '{time_str}', using {default} instead.")
+    hour, minute = map(int, default.split(":"))
+    return hour, minute
+
+def _parse_weekday(day_str: str, default: int) -> int:
+    """Parse a weekday number (0=Sunday to 6=Saturday), falling back to default."""
+    if day_str.strip().isdigit() and 0 <= int(day_str) <= 6:
+        return int(day_str)
+    print(f"Warning: Invalid weekday '{day_str}', using {default} instead.")
+    return default
 
 # Scheduled announcement settings
-DAILY_ANNOUNCEMENT_TIME = os.getenv("DAILY_ANNOUNCEMENT_TIME", "09:00")  # Format: HH:MM
-WEEKLY_ANNOUNCEMENT_DAY = int(os.getenv("WEEKLY_ANNOUNCEMENT_DAY", "1"))  # 0=Monday, 6=Sunday
-WEEKLY_ANNOUNCEMENT_TIME = os.getenv("WEEKLY_ANNOUNCEMENT_TIME", "10:00")  # Format: HH:MM
+DAILY_ANNOUNCEMENT_TIME = os.getenv("DAILY_ANNOUNCEMENT_TIME", DEFAULT_DAILY_TIME)  # Format: HH:MM
+WEEKLY_ANNOUNCEMENT_DAY = _parse_weekday(os.getenv("WEEKLY_ANNOUNCEMENT_DAY", str(DEFAULT_WEEKLY_DAY)), DEFAULT_WEEKLY_DAY)  # 0=Sunday, 6=Saturday
+WEEKLY_ANNOUNCEMENT_TIME = os.getenv("WEEKLY_ANNOUNCEMENT_TIME", DEFAULT_WEEKLY_TIME)  # Format: HH:MM
+
+# Time zone the announcement times are given in, e.g. Europe/London; scheduled
+# jobs fire at that local time, including across daylight saving changes
+SCHEDULE_TIMEZONE = os.getenv("SCHEDULE_TIMEZONE", "UTC")
+try:
+    SCHEDULE_TZINFO: datetime.tzinfo = ZoneInfo(SCHEDULE_TIMEZONE)
+except (ZoneInfoNotFoundError, ValueError):
+    print(f"Warning: Unknown time zone '{SCHEDULE_TIMEZONE}', using UTC instead.")
+    SCHEDULE_TZINFO = datetime.timezone.utc
+
+# Precomputed (hour, minute) tuples so the scheduler doesn't re-parse the strings
+DAILY_ANNOUNCEMENT_HOUR_MINUTE = _parse_hour_minute(DAILY_ANNOUNCEMENT_TIME, DEFAULT_DAILY_TIME)
+WEEKLY_ANNOUNCEMENT_HOUR_MINUTE = _parse_hour_minute(WEEKLY_ANNOUNCEMENT_TIME, DEFAULT_WEEKLY_TIME)
+
+# Optional channel for community-wide broadcasts, e.g. @mychannel or -1001234567890
+# When set, broadcasts are posted once to the channel instead of to every user
+BROADCAST_CHANNEL_ID = os.getenv("BROADCAST_CHANNEL_ID", "")
 
 # Check if admin IDs are configured
 if not ADMIN_IDS:
@@ -1,47 +1,42 @@
 # This file handles all database operations for the bot
 
+import os
+import asyncio
 import logging
 import datetime
+import time
 import pymongo
-from typing import Dict, Any, List, Optional
-from pymongo import MongoClient
-from pymongo.collection import Collection
-from pymongo.database import Database
-
-# Enable logging
-logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
-)
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
+from pymongo import AsyncMongoClient
+
 logger = logging.getLogger(__name__)
 
+# MongoDB settings, read once at import (main.py loads .env before importing bot modules)
+MONGODB_URI = os.getenv("MONGODB_URI")
+# Use a consistent database name - changed from "community_ai_bot" to match your setup
+DB_NAME = os.getenv("DB_NAME", "telegram_bot")
+
+# Queued chat messages are written in batches of up to this many, waiting at
+# most MESSAGE_FLUSH_INTERVAL seconds for a batch to fill
+MESSAGE_BATCH_SIZE = 100
+MESSAGE_FLUSH_INTERVAL = 0.25
+
 class DatabaseManager:
-    _instance = None
-    _client = None
-    _db = None
-    _users_collection = None
-    _admins_collection = None
-    _settings_collection = None
-
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super(DatabaseManager, cls).__new__(cls)
-            cls._connect_to_db()
-        return cls._instance
-
-    @classmethod
-    def _connect_to_db(cls) -> None:
-        """Connect to MongoDB database."""
+    ADMIN_CACHE_TTL = 60
+    USER_IDS_CACHE_TTL = 60
+    SETTINGS_CACHE_TTL = 300
+
+    def __init__(self):
+        self._reset_connection()
+        # Background writer for chat messages, started by start_message_writer()
+        self._message_queue: Optional[asyncio.Queue] = None
+        self._message_writer_task: Optional[asyncio.Task] = None
+
+    async def connect(self) -> None:
+        """Connect to MongoDB. Must be awaited from the bot's event loop before use."""
         try:
-            import os
-            from dotenv import load_dotenv
-            
-            # Load environment variables
-            load_dotenv()
-            
-            # Get MongoDB URI from environment variables
-            mongodb_uri = os.getenv("MONGODB_URI")
-            # Use a consistent database name - changed from "community_ai_bot" to match your setup
-            db_name = os.getenv("DB_NAME", "telegram_bot")
+            mongodb_uri = MONGODB_URI
+            db_name = DB_NAME
             
             if not mongodb_uri:
                 logger.error("❌ MONGODB_URI environment variable is not set!")
@@ -49,56 +44,121 @@ class DatabaseManager:
                 
             logger.info(f"🔄 Attempting to connect to MongoDB with URI: {mongodb_uri[:20]}...")
             
-            # Connect to MongoDB with a timeout to avoid hanging
-            cls._client = MongoClient(mongodb_uri, serverSelectionTimeoutMS=5000)
+            # Test the connection by making a simple call; this is the first
+            # operation, so it is also what opens the client's connections
+            await self.client.admin.command('ping')
             
-            # Test the connection by making a simple call
-            cls._client.admin.command('ping')
-            
-            cls._db = cls._client[db_name]
+            self._db = self.client[db_name]
             logger.info(f"✅ Connected to MongoDB database: {db_name}")
             
             # Initialize collections
-            cls._users_collection = cls._db["users"]
-            cls._admins_collection = cls._db["admins"]
-            cls._settings_collection = cls._db["settings"]
+            self._users_collection = self._db["users"]
+            self._admins_collection = self._db["admins"]
+            self._settings_collection = self._db["settings"]
+            self._messages_collection = self._db["messages"]
             
-            # Create indexes
-            cls._users_collection.create_index("user_id", unique=True)
-            cls._admins_collection.create_index("user_id", unique=True)
+            # Create indexes that don't exist yet
+            await self._ensure_index(self._users_collection, [("user_id", 1)], unique=True)
+            await self._ensure_index(self._admins_collection, [("user_id", 1)], unique=True)
+            await self._ensure_index(self._messages_collection, [("user_id", 1), ("timestamp", -1)])
             
             # Initialize settings if they don't exist
-            cls._initialize_defaults()
+            await self._initialize_defaults()
+            
+            # Preload admin IDs so admin checks never hit the database
+            await self._load_admin_ids()
+            
+            self._connected = True
             
         except pymongo.errors.ServerSelectionTimeoutError as e:
             logger.error(f"❌ MongoDB connection timeout: {e}")
-            cls._reset_connection()
+            self._reset_connection()
         except pymongo.errors.ConnectionFailure as e:
             logger.error(f"❌ MongoDB connection failure: {e}")
-            cls._reset_connection()
+            self._reset_connection()
         except Exception as e:
             logger.error(f"❌ Failed to connect to MongoDB: {e}")
-            cls._reset_connection()
+            self._reset_connection()
+
+    @property
+    def client(self) -> AsyncMongoClient:
+        """
+        The MongoDB client, created on first access.
+        Nothing touches the network until the first operation, so importing this
+        module (or creating DatabaseManager) never opens a connection.
+        """
+        if self._client is None:
+            # An async client so queries never block the event loop, with
+            # timeouts to avoid hanging. minPoolSize keeps warm connections open
+            # so bursts of updates don't pay a fresh handshake.
+            self._client = AsyncMongoClient(
+                MONGODB_URI,
+                serverSelectionTimeoutMS=5000,
+                connectTimeoutMS=5000,
+                socketTimeoutMS=10000,
+                maxPoolSize=20,
+                minPoolSize=5,
+                maxIdleTimeMS=60000,
+                retryWrites=True,
+                connect=False
+            )
+        return self._client
+
+    async def close(self) -> None:
+        """Close the database client. Called on application shutdown."""
+        await self.stop_message_writer()
+        if self._client is not None:
+            await self._client.close()
+            self._reset_connection()
+            logger.info("Closed MongoDB connection")
+
+    @staticmethod
+    async def _ensure_index(collection, keys: List[Tuple[str, int]], **kwargs) -> None:
+        """Create an index only if an index with the same default name is not already present."""
+        name = "_".join(f"{field}_{direction}" for field, direction in keys)
+        existing = {index["name"] async for index in await collection.list_indexes()}
+        if name in existing:
+            return
+        await collection.create_index(keys, **kwargs)
+        logger.info(f"✅ Created index {name} on {collection.name}")
 
-    @classmethod
-    def _reset_connection(cls):
+    def _reset_connection(self):
         """Reset all connection-related attributes."""
-        cls._client = None
-        cls._db = None
-        cls._users_collection = None
-        cls._admins_collection = None
-        cls._settings_collection = None
-
-    @classmethod
-    def _initialize_defaults(cls) -> None:
+        self._connected = False
+        self._client = None
+        self._db = None
+        self._users_collection = None
+        self._admins_collection = None
+        self._settings_collection = None
+        self._messages_collection = None
+        # Admin IDs preloaded at connect and kept in sync by add_admin/remove_admin;
+        # also reloaded once the expiry passes to pick up changes made elsewhere
+        self._admin_ids = set()
+        self._admin_ids_expiry = 0.0
+        # Cached settings document, cleared whenever settings are updated and
+        # re-read after SETTINGS_CACHE_TTL to pick up changes made elsewhere
+        self._settings_cache = None
+        self._settings_cache_time = 0.0
+        # Cached list of all user IDs for broadcasts, cleared when a user is added
+        self._user_ids_cache: Optional[List[int]] = None
+        self._user_ids_cache_time = 0.0
+
+    def _ensure_connected(self) -> bool:
+        """Check the connected flag set by connect(), logging an error if it is not set."""
+        if self._connected:
+            return True
+        logger.error("❌ Database connection not established")
+        return False
+
+    async def _initialize_defaults(self) -> None:
         """Initialize default settings in the database."""
         try:
-            if cls._settings_collection is None:
+            if self._settings_collection is None:
                 logger.error("❌ Cannot initialize defaults: settings collection is None")
                 return
                 
             # Check if settings document exists
-            settings_count = cls._settings_collection.count_documents({})
+            settings_count = await self._settings_collection.count_documents({})
             logger.info(f"📊 Found {settings_count} settings documents")
             
             if settings_count == 0:
@@ -112,7 +172,7 @@ class DatabaseManager:
                     }
                 }
                 
-                result = cls._settings_collection.insert_one(default_settings)
+                result = await self._settings_collection.insert_one(default_settings)
                 if result.inserted_id:
                     logger.info(f"✅ Initialized default settings: {default_settings}")
                 else:
@@ -124,32 +184,50 @@ class DatabaseManager:
     # User management methods
     #--------------------------------------------------------------------------
     
-    def get_user(self, user_id: int) -> Optional[Dict[str, Any]]:
-        """Get a user by their ID."""
-        if self._users_collection is None:
-            logger.error("Database connection not established")
+    async def get_user(
+        self, user_id: int, projection: Optional[Dict[str, int]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Get a user by their ID, optionally limited to the fields in projection."""
+        if not self._ensure_connected():
             return None
         try:
-            return self._users_collection.find_one({"user_id": user_id})
+            return await self._users_collection.find_one({"user_id": user_id}, projection)
         except Exception as e:
             logger.error(f"Error getting user {user_id}: {e}")
             return None
 
-    def get_all_users(self) -> List[Dict[str, Any]]:
-        """Get all users from the database."""
-        if self._users_collection is None:
-            logger.error("Database connection not established")
-            return []
+    async def get_all_users(self, batch_size: int = 500) -> AsyncIterator[Dict[str, Any]]:
+        """Stream all users from the database; callers that need a list collect it themselves."""
+        if not self._ensure_connected():
+            return
         try:
-            return list(self._users_collection.find())
+            async for user in self._users_collection.find().batch_size(batch_size):
+                yield user
         except Exception as e:
             logger.error(f"Error getting all users: {e}")
+
+    async def get_all_user_ids(self) -> List[int]:
+        """Get the IDs of all users, reusing a cached list for up to USER_IDS_CACHE_TTL seconds."""
+        if not self._ensure_connected():
+            return []
+        now = time.monotonic()
+        if self._user_ids_cache is not None and now - self._user_ids_cache_time < self.USER_IDS_CACHE_TTL:
+            return self._user_ids_cache
+        try:
+            self._user_ids_cache = [
+                user["user_id"]
+                async for user in self._users_collection.find({}, {"user_id": 1, "_id": 0}).batch_size(500)
+                if user.get("user_id")
+            ]
+            self._user_ids_cache_time = now
+            return self._user_ids_cache
+        except Exception as e:
+            logger.error(f"Error getting all user IDs: {e}")
             return []
 
-    def add_user(self, user_data: Dict[str, Any]) -> bool:
+    async def add_user(self, user_data: Dict[str, Any]) -> bool:
         """Add a new user or update an existing user."""
-        if self._users_collection is None:
-            logger.error("❌ Database connection not established - cannot add user")
+        if not self._ensure_connected():
             return False
         
         if "user_id" not in user_data:
@@ -158,104 +236,165 @@ class DatabaseManager:
             
         try:
             user_id = user_data["user_id"]
-            logger.info(f"🔄 Adding/updating user with ID: {user_id}")
+            logger.debug("Adding/updating user with ID: %s", user_id)
             
-            existing_user = self.get_user(user_id)
-            if existing_user:
-                # Update existing user
-                update_data = {
-                    "username": user_data.get("username"),
-                    "first_name": user_data.get("first_name"),
-                    "last_name": user_data.get("last_name"),
-                    "last_active": datetime.datetime.utcnow().isoformat() + "Z"
-                }
-                
-                result = self._users_collection.update_one(
-                    {"user_id": user_id},
-                    {"$set": update_data}
-                )
-                
-                if result.modified_count > 0:
-                    logger.info(f"✅ Updated user {user_id}")
-                else:
-                    logger.warning(f"⚠️ User {user_id} update had no effect")
-                return True
+            # Stored as a native BSON datetime rather than an ISO string
+            now = datetime.datetime.utcnow()
+            
+            # Single round-trip: update mutable fields, set create-only fields on insert
+            result = await self._users_collection.update_one(
+                {"user_id": user_id},
+                {
+                    "$set": {
+                        "username": user_data.get("username"),
+                        "first_name": user_data.get("first_name"),
+                        "last_name": user_data.get("last_name"),
+                        "last_active": now
+                    },
+                    "$setOnInsert": {"created_at": now}
+                },
+                upsert=True
+            )
+            
+            if result.upserted_id is not None:
+                # A new user must be included in the next broadcast
+                self._user_ids_cache = None
+                logger.debug("Added new user %s", user_id)
             else:
-                # Add new user
-                user_data["created_at"] = datetime.datetime.utcnow().isoformat() + "Z"
-                user_data["last_active"] = user_data["created_at"]
-                user_data["messages"] = []
-                
-                result = self._users_collection.insert_one(user_data)
-                if result.inserted_id:
-                    logger.info(f"✅ Added new user {user_id}")
-                    return True
-                else:
-                    logger.error(f"❌ Failed to insert new user {user_id}")
-                    return False
-        except pymongo.errors.DuplicateKeyError:
-            logger.warning(f"⚠️ Duplicate key error for user {user_data.get('user_id')}")
-            return False
+                logger.debug("Updated user %s", user_id)
+            return True
         except Exception as e:
             logger.error(f"❌ Error adding/updating user: {e}")
             return False
 
-    def add_message(self, user_id: int, message_text: str) -> bool:
-        """Add a message to a user's history."""
-        if self._users_collection is None:
-            logger.error("Database connection not established")
+    def start_message_writer(self) -> None:
+        """Start the background task that writes queued messages in batches."""
+        if self._message_writer_task is not None:
+            return
+        self._message_queue = asyncio.Queue()
+        self._message_writer_task = asyncio.create_task(self._message_writer())
+        logger.info("✅ Message writer started")
+
+    async def stop_message_writer(self) -> None:
+        """Write any queued messages and stop the background writer."""
+        if self._message_writer_task is None:
+            return
+        # The sentinel is queued behind pending messages, so they are written first
+        self._message_queue.put_nowait(None)
+        await self._message_writer_task
+        self._message_writer_task = None
+        self._message_queue = None
+        logger.info("Stopped message writer")
+
+    def queue_message(self, user_id: int, message_text: str) -> bool:
+        """Queue a message for the background writer without waiting on the database."""
+        if self._message_queue is None:
+            logger.error("❌ Message writer not running - cannot store message")
             return False
+        self._message_queue.put_nowait(
+            {"user_id": user_id, "text": message_text, "timestamp": datetime.datetime.utcnow()}
+        )
+        return True
+
+    async def _message_writer(self) -> None:
+        """Collect queued messages into batches and write each batch with one insert_many."""
+        loop = asyncio.get_running_loop()
+        while True:
+            message = await self._message_queue.get()
+            if message is None:
+                return
+            batch = [message]
+            stopping = False
+            
+            # Give more messages a moment to arrive so they share one insert
+            deadline = loop.time() + MESSAGE_FLUSH_INTERVAL
+            while len(batch) < MESSAGE_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    message = await asyncio.wait_for(self._message_queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if message is None:
+                    stopping = True
+                    break
+                batch.append(message)
+            
+            await self._write_messages(batch)
+            if stopping:
+                return
+
+    async def _write_messages(self, batch: List[Dict[str, Any]]) -> None:
+        """Insert a batch of messages, logging instead of raising on failure."""
+        if not self._ensure_connected():
+            return
         try:
-            message = {"text": message_text, "timestamp": datetime.datetime.utcnow().isoformat() + "Z"}
-            result = self._users_collection.update_one({"user_id": user_id}, {"$push": {"messages": message}})
-            if result.modified_count > 0:
-                logger.info(f"Added message for user {user_id}")
-                return True
-            else:
-                logger.warning(f"User {user_id} not found when adding message")
-                return False
+            await self._messages_collection.insert_many(batch, ordered=False)
+            logger.debug("Wrote %s queued messages", len(batch))
         except Exception as e:
-            logger.error(f"Error adding message for user {user_id}: {e}")
-            return False
+            logger.error(f"❌ Error writing {len(batch)} queued messages: {e}")
+
+    async def get_recent_messages(self, user_id: int, limit: int = 50) -> List[Dict[str, Any]]:
+        """Get a user's most recent messages, newest first."""
+        if not self._ensure_connected():
+            return []
+        try:
+            cursor = self._messages_collection.find({"user_id": user_id}).sort("timestamp", -1).limit(limit)
+            return await cursor.to_list()
+        except Exception as e:
+            logger.error(f"Error getting recent messages for user {user_id}: {e}")
+            return []
 
     #--------------------------------------------------------------------------
     # Admin management methods
     #--------------------------------------------------------------------------
     
-    def is_admin(self, user_id: int) -> bool:
+    async def _load_admin_ids(self) -> None:
+        """Load the set of admin IDs from the database."""
+        admin_ids = await self._admins_collection.distinct("user_id")
+        self._admin_ids = set(admin_ids)
+        self._admin_ids_expiry = time.monotonic() + self.ADMIN_CACHE_TTL
+        logger.info(f"✅ Loaded {len(self._admin_ids)} admin IDs")
+
+    async def _refresh_admin_ids(self) -> None:
+        """Reload the admin ID set if it has expired."""
+        if time.monotonic() > self._admin_ids_expiry:
+            await self._load_admin_ids()
+
+    async def is_admin(self, user_id: int) -> bool:
         """Check if a user is an admin."""
-        if self._admins_collection is None:
-            logger.error("Database connection not established")
+        if not self._ensure_connected():
             return False
         try:
-            admin = self._admins_collection.find_one({"user_id": user_id})
-            return admin is not None
+            await self._refresh_admin_ids()
+            return user_id in self._admin_ids
         except Exception as e:
             logger.error(f"Error checking admin status for user {user_id}: {e}")
             return False
 
-    def add_admin(self, user_id: int, added_by: int, added_by_username: str = None) -> bool:
+    async def add_admin(self, user_id: int, added_by: int, added_by_username: str = None) -> bool:
         """Add a new admin."""
-        if self._admins_collection is None:
-            logger.error("❌ Database connection not established - cannot add admin")
+        if not self._ensure_connected():
             return False
         try:
             logger.info(f"🔄 Adding admin with ID: {user_id}, added by: {added_by}")
             
             # Check if user is already an admin
-            if self.is_admin(user_id):
+            if await self.is_admin(user_id):
                 logger.info(f"ℹ️ User {user_id} is already an admin")
                 return True
                 
             admin_data = {
                 "user_id": user_id,
-                "added_at": datetime.datetime.utcnow().isoformat() + "Z",
+                "added_at": datetime.datetime.utcnow(),
                 "added_by": added_by
             }
             if added_by_username:
                 admin_data["added_by_username"] = added_by_username
                 
-            result = self._admins_collection.insert_one(admin_data)
+            result = await self._admins_collection.insert_one(admin_data)
+            self._admin_ids.add(user_id)
             if result.inserted_id:
                 logger.info(f"✅ Added new admin with ID {user_id}")
                 return True
@@ -265,18 +404,19 @@ class DatabaseManager:
         except pymongo.errors.DuplicateKeyError:
             logger.warning(f"⚠️ Duplicate key error for admin {user_id}")
             # User is already an admin, so return True
+            self._admin_ids.add(user_id)
             return True
         except Exception as e:
             logger.error(f"❌ Error adding admin: {e}")
             return False
 
-    def remove_admin(self, user_id: int) -> bool:
+    async def remove_admin(self, user_id: int) -> bool:
         """Remove an admin."""
-        if self._admins_collection is None:
-            logger.error("Database connection not established")
+        if not self._ensure_connected():
             return False
         try:
-            result = self._admins_collection.delete_one({"user_id": user_id})
+            result = await self._admins_collection.delete_one({"user_id": user_id})
+            self._admin_ids.discard(user_id)
             if result.deleted_count > 0:
                 logger.info(f"Removed admin with ID {user_id}")
                 return True
@@ -287,28 +427,53 @@ class DatabaseManager:
             logger.error(f"Error removing admin: {e}")
             return False
 
-    def get_all_admins(self) -> List[Dict[str, Any]]:
-        """Get all admins from the database."""
-        if self._admins_collection is None:
-            logger.error("Database connection not established")
-            return []
+    async def has_any_admin(self) -> bool:
+        """Check whether at least one admin exists."""
+        if not self._ensure_connected():
+            return False
         try:
-            return list(self._admins_collection.find())
+            if self._admin_ids:
+                return True
+            # An empty set may just be stale; collection metadata answers in O(1)
+            return await self._admins_collection.estimated_document_count() > 0
+        except Exception as e:
+            logger.error(f"Error checking for admins: {e}")
+            return False
+
+    async def get_all_admins(self) -> AsyncIterator[Dict[str, Any]]:
+        """Stream all admins from the database."""
+        if not self._ensure_connected():
+            return
+        try:
+            async for admin in self._admins_collection.find(
+                {}, {"user_id": 1, "added_at": 1, "added_by": 1, "_id": 0}
+            ):
+                yield admin
         except Exception as e:
             logger.error(f"Error getting all admins: {e}")
-            return []
 
     #--------------------------------------------------------------------------
     # Settings and schedule management methods
     #--------------------------------------------------------------------------
     
-    def get_schedule_settings(self) -> Dict[str, Any]:
+    async def _get_settings_document(self) -> Optional[Dict[str, Any]]:
+        """Return the settings document, reading it from MongoDB only when the cache is empty or stale."""
+        now = time.monotonic()
+        if self._settings_cache is None or now - self._settings_cache_time >= self.SETTINGS_CACHE_TTL:
+            self._settings_cache = await self._settings_collection.find_one({})
+            self._settings_cache_time = now
+        return self._settings_cache
+
+    def invalidate_settings_cache(self) -> None:
+        """Drop the cached settings so the next read goes to the database."""
+        self._settings_cache = None
+
+    async def get_schedule_settings(self) -> Dict[str, Any]:
         """Get the schedule settings."""
-        if self._settings_collection is None:
-            logger.error("Database connection not established")
+        if not self._ensure_connected():
             return {}
         try:
-            settings = self._settings_collection.find_one({})
+            settings = await self._get_settings_document()
             if settings:
                 return {
                     "daily_time": settings.get("daily_time", "09:00"),
@@ -320,14 +485,13 @@ class DatabaseManager:
             logger.error(f"Error getting schedule settings: {e}")
             return {}
 
-    def update_schedule_settings(
+    async def update_schedule_settings(
         self, daily_time: str = None, weekly_day: int = None, 
         weekly_time: str = None, daily_message: str = None, 
         weekly_message: str = None
     ) -> bool:
         """Update the schedule settings."""
-        if self._settings_collection is None:
-            logger.error("Database connection not established")
+        if not self._ensure_connected():
             return False
         try:
             update_data = {}
@@ -341,8 +505,8 @@ class DatabaseManager:
             # Update messages if provided
             if daily_message is not None or weekly_message is not None:
                 # First get current messages
-                settings = self._settings_collection.find_one({})
-                messages = settings.get("messages", {}) if settings else {}
+                settings = await self._get_settings_document()
+                messages = dict(settings.get("messages", {})) if settings else {}
                 
                 if daily_message is not None:
                     messages["daily"] = daily_message
@@ -352,7 +516,8 @@ class DatabaseManager:
                 update_data["messages"] = messages
             
             if update_data:
-                result = self._settings_collection.update_one({}, {"$set": update_data}, upsert=True)
+                result = await self._settings_collection.update_one({}, {"$set": update_data}, upsert=True)
+                self.invalidate_settings_cache()
                 if result.modified_count > 0 or result.upserted_id:
                     logger.info(f"Updated schedule settings: {update_data}")
                     return True
@@ -361,30 +526,29 @@ class DatabaseManager:
             logger.error(f"Error updating schedule settings: {e}")
             return False
 
-    def get_announcement_messages(self) -> Dict[str, Any]:
+    async def get_announcement_messages(self) -> Dict[str, Any]:
         """Get the announcement messages."""
-        if self._settings_collection is None:
-            logger.error("Database connection not established")
+        if not self._ensure_connected():
             return {}
         try:
-            settings = self._settings_collection.find_one({})
+            settings = await self._get_settings_document()
             if settings and "messages" in settings:
-                return settings["messages"]
+                return dict(settings["messages"])
             return {}
         except Exception as e:
             logger.error(f"Error getting announcement messages: {e}")
             return {}
 
-    def update_announcement_message(self, announcement_type: str, message: str) -> bool:
+    async def update_announcement_message(self, announcement_type: str, message: str) -> bool:
         """Update an announcement message."""
-        if self._settings_collection is None:
-            logger.error("Database connection not established")
+        if not self._ensure_connected():
             return False
         try:
-            result = self._settings_collection.update_one(
+            result = await self._settings_collection.update_one(
                 {}, 
                 {"$set": {f"messages.{announcement_type}": message}}
             )
+            self.invalidate_settings_cache()
             if result.modified_count > 0:
                 logger.info(f"Updated {announcement_type} announcement message")
                 return True
@@ -393,34 +557,30 @@ class DatabaseManager:
             logger.error(f"Error updating {announcement_type} announcement message: {e}")
             return False
 
-    def check_connection(self) -> bool:
+    async def check_connection(self) -> bool:
         """Check if the database connection is established and working."""
-        if self._client is None or self._db is None:
-            logger.error("❌ Database connection not established")
+        if not self._ensure_connected():
             return False
             
         try:
             # Try to ping the database
-            self._client.admin.command('ping')
+            await self._client.admin.command('ping')
             logger.info("✅ Database connection is working")
             
-            # Log collection information
-            if self._users_collection is not None:
-                user_count = self._users_collection.count_documents({})
-                logger.info(f"📊 Users collection has {user_count} documents")
-                
-            if self._admins_collection is not None:
-                admin_count = self._admins_collection.count_documents({})
-                logger.info(f"📊 Admins collection has {admin_count} documents")
-                
-            if self._settings_collection is not None:
-                settings_count = self._settings_collection.count_documents({})
-                logger.info(f"📊 Settings collection has {settings_count} documents")
+            # Log collection information; skip the counts when nobody would see them
+            if not logger.isEnabledFor(logging.INFO):
+                return True
+            user_count = await self._users_collection.count_documents({})
+            logger.info(f"📊 Users collection has {user_count} documents")
+            admin_count = await self._admins_collection.count_documents({})
+            logger.info(f"📊 Admins collection has {admin_count} documents")
+            settings_count = await self._settings_collection.count_documents({})
+            logger.info(f"📊 Settings collection has {settings_count} documents")
                 
             return True
         except Exception as e:
             logger.error(f"❌ Database connection check failed: {e}")
             return False
 
-# Create a singleton instance of the DatabaseManager
+# The single DatabaseManager instance shared by the bot
 db_manager = DatabaseManager()
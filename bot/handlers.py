@@ -1,62 +1,133 @@
 # This file contains message handlers for the bot
 
+import asyncio
 import logging
-from typing import Dict, Any
-from telegram import Update
-from telegram.ext import ContextTypes
+import re
+import time
+from typing import Dict, Any, Set
+from telegram import Update, User
+from telegram.ext import ContextTypes, filters
 from bot.database import db_manager
-from bot.ai import generate_ai_response
+from bot.ai import stream_ai_response
+from bot.utils import keep_typing, reply_streaming
 
-# Enable logging
-logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
-)
 logger = logging.getLogger(__name__)
 
-def store_user_data(update: Update) -> None:
-    """Store user data in the database."""
-    user = update.effective_user
-    user_data = {
+# Canned replies for simple greetings, keyed by the lowercased greeting; these
+# are answered by greeting_handler instead of calling the AI
+_REPLIES = {
+    "hi": "Hello! 👋 How can I help you today?",
+    "hello": "Hello! 👋 How can I help you today?",
+    "hey": "Hey! 👋 How can I help you today?",
+    "hola": "Hola! 👋 How can I help you today?",
+    "greetings": "Greetings! 👋 How can I help you today?",
+}
+
+# A greeting on its own, allowing surrounding whitespace and trailing "!" or "."
+_GREETING_RE = re.compile(rf"^\s*({'|'.join(_REPLIES)})[!.\s]*$", re.IGNORECASE)
+
+# Dispatcher-level filter so greetings are routed to greeting_handler and never
+# reach handle_message
+GREETING_FILTER = filters.Regex(_GREETING_RE)
+
+# Longest message passed on to the AI; longer ones are declined so they don't
+# waste tokens or slow the response down
+MAX_PROMPT_LENGTH = 2000
+
+# Users whose profile was written recently, mapped to when it was written;
+# their profile is only rewritten once USER_REFRESH_INTERVAL has passed
+_SEEN_USERS: Dict[int, float] = {}
+USER_REFRESH_INTERVAL = 3600  # seconds
+
+# Strong references to in-flight background profile writes, so they are not
+# garbage collected before they finish
+_background_writes: Set[asyncio.Task] = set()
+
+# Serialises the first-admin check in /start: updates from different chats run
+# concurrently, so two first-time users could otherwise both become admin
+_first_admin_lock = asyncio.Lock()
+
+async def seed_seen_users() -> None:
+    """Mark every user already in the database as seen. Called once at startup."""
+    now = time.monotonic()
+    for user_id in await db_manager.get_all_user_ids():
+        _SEEN_USERS[user_id] = now
+    logger.info(f"✅ Seeded {len(_SEEN_USERS)} known users")
+
+def _needs_user_write(user_id: int) -> bool:
+    """Check whether the user's profile should be written, marking it as written if so."""
+    now = time.monotonic()
+    last_written = _SEEN_USERS.get(user_id)
+    if last_written is not None and now - last_written < USER_REFRESH_INTERVAL:
+        return False
+    _SEEN_USERS[user_id] = now
+    return True
+
+def get_user_data(user: User) -> Dict[str, Any]:
+    """Build the user profile fields stored in the database."""
+    return {
         "user_id": user.id,
         "username": user.username,
         "first_name": user.first_name,
         "last_name": user.last_name
     }
-    db_manager.add_user(user_data)
+
+def store_user_data(user: User) -> None:
+    """
+    Store user data in the database, skipping users whose profile was written recently.
+    The write runs in the background so replies never wait on it; if it fails the
+    user is forgotten so the next update retries it.
+    """
+    user_id = user.id
+    if not _needs_user_write(user_id):
+        return
+    
+    task = asyncio.create_task(db_manager.add_user(get_user_data(user)))
+    _background_writes.add(task)
+    
+    def on_done(finished: asyncio.Task) -> None:
+        _background_writes.discard(finished)
+        if finished.cancelled() or finished.exception() is not None or not finished.result():
+            _SEEN_USERS.pop(user_id, None)
+    
+    task.add_done_callback(on_done)
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Send a message when the command /start is issued."""
+    user = update.effective_user
+    message = update.message
+    
     # Store user data when they start the bot
-    store_user_data(update)
+    store_user_data(user)
     
-    # Check if there are any admins in the database
-    admins = db_manager.get_all_admins()
-    user_id = update.effective_user.id
+    user_id = user.id
     
     # If no admins exist, make this user an admin
-    if not admins:
-        if db_manager.add_admin(user_id, "system"):
-            await update.message.reply_text(
-                f"Welcome! You are the first user, so I've made you an admin.\n\n"
-                f"Your user ID is: {user_id}\n\n"
-                f"Type /help to see available commands."
-            )
-            return
+    async with _first_admin_lock:
+        made_admin = not await db_manager.has_any_admin() and await db_manager.add_admin(user_id, "system")
+    if made_admin:
+        await message.reply_text(
+            f"Welcome! You are the first user, so I've made you an admin.\n\n"
+            f"Your user ID is: {user_id}\n\n"
+            f"Type /help to see available commands."
+        )
+        return
     
     # Regular welcome message
-    await update.message.reply_text(
+    await message.reply_text(
         f"Welcome to the Community AI Bot! I'm here to help answer your questions.\n\n"
         f"Type /help to see available commands."
     )
 
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Send a message when the command /help is issued."""
+    user = update.effective_user
+    
     # Store user data when they use help command
-    store_user_data(update)
+    store_user_data(user)
     
     # Check if the user is an admin
-    user_id = update.effective_user.id
-    is_admin = db_manager.is_admin(user_id)
+    is_admin = await db_manager.is_admin(user.id)
     
     # Base help message for all users
     help_message = (
@@ -81,26 +152,48 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
     
     await update.message.reply_text(help_message)
 
+async def greeting_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Answer a simple greeting directly, without a round-trip to the AI."""
+    user = update.effective_user
+    message = update.message
+    db_manager.queue_message(user.id, message.text)
+    store_user_data(user)
+    
+    # GREETING_FILTER already matched the text; PTB passes the match along
+    greeting = context.matches[0].group(1).lower()
+    await message.reply_text(_REPLIES[greeting])
+
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle the user message and respond with AI."""
-    # Store user data and message
-    store_user_data(update)
-    user_id = update.effective_user.id
-    message_text = update.message.text
-    db_manager.add_message(user_id, message_text)
+    # Resolve the update's user, chat and message once
+    user = update.effective_user
+    chat_id = update.effective_chat.id
+    message = update.message
+    message_text = (message.text or "").strip()
+    
+    # Nothing to answer or store for an empty message
+    if not message_text:
+        return
+    
+    # Store the message and, if it is due a refresh, the user's profile; neither
+    # write is awaited so the reply goes out straight away
+    db_manager.queue_message(user.id, message_text)
+    store_user_data(user)
+    
+    if len(message_text) > MAX_PROMPT_LENGTH:
+        await message.reply_text(
+            f"That message is a bit long for me. Please keep it under {MAX_PROMPT_LENGTH} characters."
+        )
+        return
     
     # Generate AI response
     try:
-        # Send typing action
-        await context.bot.send_chat_action(chat_id=update.effective_chat.id, action="typing")
-        
-        # Get AI response
-        response = await generate_ai_response(message_text)
-        
-        # Send the response
-        await update.message.reply_text(response)
+        # Stream the AI response so the user sees text as soon as it arrives,
+        # keeping the typing indicator up until it is complete
+        async with keep_typing(context.bot, chat_id):
+            await reply_streaming(message, stream_ai_response(message_text))
     except Exception as e:
         logger.error(f"Error generating AI response: {e}")
-        await update.message.reply_text(
+        await message.reply_text(
             "I'm sorry, I couldn't generate a response at the moment. Please try again later."
         )
\ No newline at end of file
@@ -0,0 +1,85 @@
+# This file manages the pool of motivational messages served by /motivate
+
+import os
+import json
+import random
+import logging
+from typing import List, Optional
+from telegram.ext import ContextTypes
+from bot.ai import generate_ai_response, FALLBACK_REPLIES
+
+logger = logging.getLogger(__name__)
+
+# Pre-generated messages shipped with the bot
+MOTIVATIONS_FILE = os.path.join(os.path.dirname(__file__), "data", "motivations.json")
+
+# Maximum number of messages kept in the pool
+MAX_MOTIVATIONS = 200
+
+# The pool is only served once it holds at least this many messages; below
+# that, /motivate calls the LLM and grows the pool with the results
+MIN_POOL_SIZE = 50
+
+# Number of fresh messages generated on each background refresh
+REFRESH_COUNT = 5
+
+MOTIVATE_PROMPT = "Generate a short, uplifting motivational message to inspire community members. Keep it concise, positive, and energizing."
+
+# Themes give each refresh prompt some variety, so cached answers aren't reused
+REFRESH_THEMES = (
+    "kindness", "persistence", "teamwork", "learning", "gratitude",
+    "courage", "curiosity", "generosity", "patience", "hope",
+)
+
+def _load_motivations() -> List[str]:
+    """Load the pre-generated motivational messages from disk."""
+    try:
+        with open(MOTIVATIONS_FILE, encoding="utf-8") as f:
+            motivations = [m for m in json.load(f) if isinstance(m, str) and m.strip()]
+        logger.info(f"✅ Loaded {len(motivations)} motivational messages")
+        return motivations[-MAX_MOTIVATIONS:]
+    except (OSError, ValueError) as e:
+        logger.error(f"⚠️ Failed to load motivational messages from {MOTIVATIONS_FILE}: {e}")
+        return []
+
+MOTIVATIONS = _load_motivations()
+
+def get_motivation() -> Optional[str]:
+    """Return a random motivational message from the pool, or None while it is warming up."""
+    if len(MOTIVATIONS) < MIN_POOL_SIZE:
+        return None
+    return random.choice(MOTIVATIONS)
+
+def is_pool_warm() -> bool:
+    """Return True if the pool is large enough to be served."""
+    return len(MOTIVATIONS) >= MIN_POOL_SIZE
+
+def random_motivate_prompt() -> str:
+    """Return the motivate prompt with a random theme, for varied responses."""
+    return f"{MOTIVATE_PROMPT} Focus on {random.choice(REFRESH_THEMES)}."
+
+def add_motivation(text: str) -> bool:
+    """
+    Add a generated message to the pool, dropping the oldest if it is full.
+    Empty messages, fallback error replies and duplicates are skipped.
+    """
+    text = text.strip()
+    if not text or text in FALLBACK_REPLIES or text in MOTIVATIONS:
+        return False
+    MOTIVATIONS.append(text)
+    del MOTIVATIONS[:-MAX_MOTIVATIONS]
+    return True
+
+async def refresh_motivations(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Add a few freshly generated messages to the pool, dropping the oldest ones."""
+    added = 0
+    for theme in random.sample(REFRESH_THEMES, REFRESH_COUNT):
+        # Themed prompts differ by one word, so similar-prompt matches would
+        # return the same text and it would be discarded as a duplicate
+        text = await generate_ai_response(
+            f"{MOTIVATE_PROMPT} Focus on {theme}.", task="motivate", use_semantic_cache=False
+        )
+        if add_motivation(text):
+            added += 1
+    
+    logger.info(f"🔄 Refreshed motivational messages: {added} added, {len(MOTIVATIONS)} in pool")
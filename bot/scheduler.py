@@ -6,46 +6,59 @@ from typing import Dict, Any
 from telegram.ext import Application, ContextTypes
 from bot.database import db_manager
 from bot.utils import send_scheduled_announcement
-
-# Enable logging
-logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
+from bot.motivation import refresh_motivations, is_pool_warm
+from bot.config import (
+    DAILY_ANNOUNCEMENT_TIME,
+    DAILY_ANNOUNCEMENT_HOUR_MINUTE,
+    WEEKLY_ANNOUNCEMENT_DAY,
+    WEEKLY_ANNOUNCEMENT_TIME,
+    WEEKLY_ANNOUNCEMENT_HOUR_MINUTE,
+    SCHEDULE_TIMEZONE,
+    SCHEDULE_TZINFO
 )
+
 logger = logging.getLogger(__name__)
 
-def setup_scheduler(application: Application) -> None:
+async def setup_scheduler(application: Application) -> None:
     """Set up scheduled tasks using settings from the database."""
     if application.job_queue is None:
         logger.error("❌ JobQueue is not available. Please install python-telegram-bot[job-queue].")
         return
 
-    settings = db_manager.get_schedule_settings()
+    settings = await db_manager.get_schedule_settings()
+    messages = await db_manager.get_announcement_messages()
     logger.info(f"🟢 Current scheduled jobs: {application.job_queue.jobs()}")
 
-    # Parse daily announcement time and schedule using run_repeating()
+    # Parse daily announcement time and schedule it to fire once a day
     try:
-        daily_time = settings.get("daily_time", "09:00")
-        # Note: We keep daily_time_obj for logging/comparison purposes
-        daily_hour, daily_minute = map(int, daily_time.split(":"))
-        daily_time_obj = datetime.time(hour=daily_hour, minute=daily_minute)
+        # Fall back to the precomputed config time when the database has none
+        daily_time = settings.get("daily_time", DAILY_ANNOUNCEMENT_TIME)
+        if "daily_time" in settings:
+            daily_hour, daily_minute = map(int, daily_time.split(":"))
+        else:
+            daily_hour, daily_minute = DAILY_ANNOUNCEMENT_HOUR_MINUTE
+        daily_time_obj = datetime.time(hour=daily_hour, minute=daily_minute, tzinfo=SCHEDULE_TZINFO)
 
-        # Schedule daily announcement using run_repeating() to check every 60 seconds.
-        application.job_queue.run_repeating(
+        # The text is read once here; reschedule_jobs refreshes it when settings change
+        application.job_queue.run_daily(
             daily_announcement,
-            interval=60,   # Check every minute
-            first=0,
+            time=daily_time_obj,
+            data={"text": messages.get("daily", "Daily community reminder!")},
             name="daily_announcement"
         )
-        logger.info(f"✅ Daily announcement will trigger when system time equals {daily_time}")
+        logger.info(f"✅ Daily announcement scheduled for {daily_time} ({SCHEDULE_TIMEZONE})")
     except Exception as e:
         logger.error(f"⚠️ Failed to schedule daily announcement: {e}")
 
     # Parse weekly announcement time
     try:
-        weekly_time = settings.get("weekly_time", "10:00")
-        weekly_day = settings.get("weekly_day", 1)
-        weekly_hour, weekly_minute = map(int, weekly_time.split(":"))
-        weekly_time_obj = datetime.time(hour=weekly_hour, minute=weekly_minute)
+        weekly_time = settings.get("weekly_time", WEEKLY_ANNOUNCEMENT_TIME)
+        weekly_day = settings.get("weekly_day", WEEKLY_ANNOUNCEMENT_DAY)
+        if "weekly_time" in settings:
+            weekly_hour, weekly_minute = map(int, weekly_time.split(":"))
+        else:
+            weekly_hour, weekly_minute = WEEKLY_ANNOUNCEMENT_HOUR_MINUTE
+        weekly_time_obj = datetime.time(hour=weekly_hour, minute=weekly_minute, tzinfo=SCHEDULE_TZINFO)
 
         # Schedule weekly announcement; note: run_daily() with 'days' parameter
         application.job_queue.run_daily(
@@ -54,43 +67,43 @@ def setup_scheduler(application: Application) -> None:
             days=(weekly_day,),
             name="weekly_announcement"
         )
-        logger.info(f"✅ Weekly announcement scheduled for day {weekly_day} at {weekly_time}")
+        logger.info(f"✅ Weekly announcement scheduled for day {weekly_day} at {weekly_time} ({SCHEDULE_TIMEZONE})")
     except Exception as e:
         logger.error(f"⚠️ Failed to schedule weekly announcement: {e}")
 
+    # Refresh the /motivate pool weekly, starting right away if it still needs
+    # warming up; this job is not touched by reschedule_jobs
+    if not application.job_queue.get_jobs_by_name("refresh_motivations"):
+        application.job_queue.run_repeating(
+            refresh_motivations,
+            interval=datetime.timedelta(weeks=1),
+            first=0 if not is_pool_warm() else datetime.timedelta(weeks=1),
+            name="refresh_motivations"
+        )
+        logger.info("✅ Motivational message refresh scheduled weekly")
+
     logger.info(f"🟢 Final jobs in queue: {application.job_queue.jobs()}")
 
-def reschedule_jobs(application: Application) -> bool:
+async def reschedule_jobs(application: Application) -> bool:
     """Reschedule jobs with updated settings."""
     try:
         for job in application.job_queue.jobs():
             if job.name in ["daily_announcement", "weekly_announcement"]:
                 job.schedule_removal()
                 logger.info(f"🗑 Removed job: {job.name}")
-        setup_scheduler(application)
+        await setup_scheduler(application)
         return True
     except Exception as e:
         logger.error(f"⚠️ Failed to reschedule jobs: {e}")
         return False
 
 async def daily_announcement(context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Check every minute and send a daily announcement to all users when current time matches scheduled time."""
-    logger.info("🚀 Daily announcement check triggered!")
+    """Send the daily announcement to all users."""
+    logger.info("🚀 Daily announcement triggered!")
     try:
-        settings = db_manager.get_schedule_settings()
-        scheduled_time = settings.get("daily_time", "09:00")
-        now = datetime.datetime.now()
-        current_time = now.strftime("%H:%M")
-        logger.info(f"Daily check: current time {current_time}, scheduled time {scheduled_time}")
-        if current_time == scheduled_time:
-            messages = db_manager.get_announcement_messages()
-            announcement_text = messages.get("daily", "Daily community reminder!")
-            context.job.data = {"text": announcement_text}
-            logger.info(f"📨 Triggering daily announcement: {announcement_text}")
-            await send_scheduled_announcement(context)
-            logger.info("✅ Daily announcement sent successfully!")
-        else:
-            logger.info("Current time does not match scheduled time. No announcement sent.")
+        logger.info(f"📨 Sending daily announcement: {context.job.data.get('text')}")
+        await send_scheduled_announcement(context)
+        logger.info("✅ Daily announcement sent successfully!")
     except Exception as e:
         logger.error(f"⚠️ Error in daily announcement: {e}")
 
@@ -98,7 +111,7 @@ async def weekly_announcement(context: ContextTypes.DEFAULT_TYPE) -> None:
     """Send a weekly announcement to all users."""
     logger.info("🚀 Weekly announcement triggered!")
     try:
-        messages = db_manager.get_announcement_messages()
+        messages = await db_manager.get_announcement_messages()
         announcement_text = messages.get("weekly", "Weekly community update!")
         context.job.data = {"text": announcement_text}
         logger.info(f"📨 Sending weekly announcement: {announcement_text}")
@@ -1,16 +1,39 @@
 # This file contains utility functions used across the bot
 
+import asyncio
+import contextlib
 import logging
-from typing import Tuple, Dict, Any, List
-from telegram.ext import ContextTypes
+from typing import AsyncIterator, Awaitable, Callable, Tuple, Dict, Any, List, Optional
+from aiolimiter import AsyncLimiter
+from telegram import Bot, Message, Update
+from telegram.constants import ChatAction
+from telegram.error import BadRequest
+from telegram.ext import BaseUpdateProcessor, ContextTypes
 from bot.database import db_manager
+from bot.config import BROADCAST_CHANNEL_ID
 
-# Enable logging
-logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
-)
 logger = logging.getLogger(__name__)
 
+# Shared limiter for all broadcast sends, kept under Telegram's bot-wide limit
+# of 30 messages per second so interactive replies still get through
+_broadcast_limiter = AsyncLimiter(max_rate=25, time_period=1.0)
+
+# Number of concurrent senders, i.e. messages in flight at once during a broadcast
+BROADCAST_CONCURRENCY = 25
+
+# Per-user broadcasts are sent in chunks of this many users, one chunk at a
+# time, so progress is logged as the broadcast goes. Flood waits need no pause
+# here: AIORateLimiter already halts all requests for the retry_after period.
+BROADCAST_CHUNK_SIZE = 250
+
+async def send_rate_limited(context: ContextTypes.DEFAULT_TYPE, chat_id: int, text: str) -> None:
+    """
+    Send a message through the shared broadcast rate limiter.
+    Flood waits (RetryAfter) are retried by the application's AIORateLimiter.
+    """
+    async with _broadcast_limiter:
+        await context.bot.send_message(chat_id=chat_id, text=text)
+
 async def send_scheduled_announcement(context: ContextTypes.DEFAULT_TYPE) -> None:
     """Send a scheduled announcement to all users."""
     if not context.job or not context.job.data:
@@ -22,50 +45,257 @@ async def send_scheduled_announcement(context: ContextTypes.DEFAULT_TYPE) -> Non
         logger.error("No announcement text found in job data")
         return
     
-    # Get all users from the database
-    users = db_manager.get_all_users()
+    # Send to all users concurrently
+    user_ids = await db_manager.get_all_user_ids()
+    success_count, failure_count = await _fan_out(context, user_ids, announcement_text)
+    
+    logger.info(f"Scheduled announcement complete: {success_count} successful, {failure_count} failed")
+
+async def _send_broadcast_to_user(context: ContextTypes.DEFAULT_TYPE, user_id: int, message: str) -> bool:
+    """Send a broadcast message to a single user. Returns True on success."""
+    try:
+        await send_rate_limited(context, user_id, message)
+        logger.debug("Broadcast message sent to user %s", user_id)
+        return True
+    except Exception as e:
+        logger.error(f"⚠️ Failed to send broadcast message to user {user_id}: {e}")
+        return False
+
+async def _run_senders(sender: Callable[[], Awaitable[None]], count: int) -> None:
+    """
+    Run count copies of sender and wait for all of them. If one fails or the
+    broadcast is cancelled (e.g. on shutdown), the others are cancelled too
+    rather than left running.
+    """
+    if hasattr(asyncio, "TaskGroup"):
+        async with asyncio.TaskGroup() as group:
+            for _ in range(count):
+                group.create_task(sender())
+        return
+    
+    # Python < 3.11: cancel whatever is still running once gather returns or raises
+    tasks = [asyncio.create_task(sender()) for _ in range(count)]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def _send_chunk(
+    context: ContextTypes.DEFAULT_TYPE, user_ids: List[int], message: str
+) -> Tuple[int, int]:
+    """
+    Send a message to one chunk of users, using BROADCAST_CONCURRENCY senders
+    that pull from the same iterator.
+    Returns a tuple of (success_count, failure_count)
+    """
+    counts = {"success": 0, "failure": 0}
+    # A plain iterator is safe to share: next() never yields to the event loop
+    pending = iter(user_ids)
+    
+    async def sender() -> None:
+        for user_id in pending:
+            if await _send_broadcast_to_user(context, user_id, message):
+                counts["success"] += 1
+            else:
+                counts["failure"] += 1
+    
+    await _run_senders(sender, BROADCAST_CONCURRENCY)
+    return counts["success"], counts["failure"]
+
+async def _fan_out(context: ContextTypes.DEFAULT_TYPE, user_ids: List[int], message: str) -> Tuple[int, int]:
+    """
+    Send a message to every user ID in chunks of BROADCAST_CHUNK_SIZE, logging
+    progress after each chunk.
+    Returns a tuple of (success_count, failure_count)
+    """
     success_count = 0
     failure_count = 0
     
-    for user in users:
-        user_id = user.get("user_id")
-        if user_id:
-            try:
-                await context.bot.send_message(
-                    chat_id=user_id,
-                    text=announcement_text
-                )
-                success_count += 1
-                logger.info(f"Scheduled announcement sent to user {user_id}")
-            except Exception as e:
-                failure_count += 1
-                logger.error(f"Failed to send scheduled announcement to user {user_id}: {e}")
+    for start in range(0, len(user_ids), BROADCAST_CHUNK_SIZE):
+        chunk = user_ids[start:start + BROADCAST_CHUNK_SIZE]
+        
+        chunk_success, chunk_failure = await _send_chunk(context, chunk, message)
+        success_count += chunk_success
+        failure_count += chunk_failure
+        logger.info(
+            f"📤 Broadcast progress: {success_count + failure_count}/{len(user_ids)} sent "
+            f"({failure_count} failed)"
+        )
     
-    logger.info(f"Scheduled announcement complete: {success_count} successful, {failure_count} failed")
+    return success_count, failure_count
 
-async def broadcast_message(context: ContextTypes.DEFAULT_TYPE, message: str) -> Tuple[int, int]:
+async def _broadcast_to_channel(context: ContextTypes.DEFAULT_TYPE, message: str) -> Optional[Tuple[int, int]]:
+    """
+    Post a broadcast once to the configured channel.
+    Returns (subscriber_count, 0), or None if the post failed.
+    """
+    try:
+        await send_rate_limited(context, BROADCAST_CHANNEL_ID, message)
+    except Exception as e:
+        logger.error(f"⚠️ Failed to post broadcast to channel {BROADCAST_CHANNEL_ID}: {e}")
+        return None
+    
+    try:
+        subscriber_count = await context.bot.get_chat_member_count(BROADCAST_CHANNEL_ID)
+    except Exception as e:
+        logger.error(f"⚠️ Failed to get member count for channel {BROADCAST_CHANNEL_ID}: {e}")
+        subscriber_count = 0
+    
+    logger.info(f"Broadcast posted to channel {BROADCAST_CHANNEL_ID} ({subscriber_count} subscribers)")
+    return subscriber_count, 0
+
+async def broadcast_message(
+    context: ContextTypes.DEFAULT_TYPE, message: str, use_channel: bool = True
+) -> Tuple[int, int]:
     """
     Broadcast a message to all users in the database.
+    If BROADCAST_CHANNEL_ID is configured and use_channel is True, the message is
+    posted once to that channel instead; per-user sending is the fallback.
+    User IDs come from a short-lived cache and are sent to concurrently, with at most
+    BROADCAST_CONCURRENCY sends in flight and the shared rate limiter capping
+    throughput per second.
     Returns a tuple of (success_count, failure_count)
     """
+    if BROADCAST_CHANNEL_ID and use_channel:
+        result = await _broadcast_to_channel(context, message)
+        if result is not None:
+            return result
+        logger.info("Falling back to sending the broadcast to each user")
+    
     logger.info(f"🔊 Broadcasting message to all users: {message[:50]}...")
-    users = db_manager.get_all_users()
-    success_count = 0
-    failure_count = 0
+    user_ids = await db_manager.get_all_user_ids()
+    success_count, failure_count = await _fan_out(context, user_ids, message)
     
-    for user in users:
-        user_id = user.get("user_id")
-        if user_id:
+    logger.info(f"Broadcast complete: {success_count} successful, {failure_count} failed")
+    return success_count, failure_count
+
+# Telegram shows a chat action for about 5 seconds, so it is resent more often
+TYPING_REFRESH_INTERVAL = 4.0  # seconds
+
+@contextlib.asynccontextmanager
+async def keep_typing(bot: Bot, chat_id: int) -> AsyncIterator[None]:
+    """
+    Show the typing indicator in a chat for as long as the block runs.
+    The indicator is sent from a background task, so the block's own work
+    starts immediately instead of waiting on send_chat_action.
+    """
+    async def refresh() -> None:
+        while True:
             try:
-                await context.bot.send_message(
-                    chat_id=user_id,
-                    text=message
-                )
-                success_count += 1
-                logger.info(f"✅ Broadcast message sent to user {user_id}")
+                await bot.send_chat_action(chat_id=chat_id, action=ChatAction.TYPING)
             except Exception as e:
-                failure_count += 1
-                logger.error(f"⚠️ Failed to send broadcast message to user {user_id}: {e}")
+                logger.debug("Failed to send typing action to chat %s: %s", chat_id, e)
+            await asyncio.sleep(TYPING_REFRESH_INTERVAL)
     
-    logger.info(f"Broadcast complete: {success_count} successful, {failure_count} failed")
-    return success_count, failure_count
+    task = asyncio.create_task(refresh())
+    try:
+        yield
+    finally:
+        task.cancel()
+
+# How often a streamed reply is edited with newly received text
+STREAM_EDIT_INTERVAL = 0.3  # seconds
+STREAM_EDIT_CHUNKS = 40
+
+async def reply_streaming(
+    message: Message, chunks: AsyncIterator[str], prefix: str = "", parse_mode: Optional[str] = None
+) -> str:
+    """
+    Reply to a message with text that arrives in pieces, editing the reply as
+    more text comes in. Edits are batched to every STREAM_EDIT_INTERVAL seconds
+    or STREAM_EDIT_CHUNKS pieces, whichever comes first.
+    parse_mode is only applied to the final edit, since partial text may not be valid markup.
+    Returns the full text that was received.
+    """
+    loop = asyncio.get_running_loop()
+    text = ""
+    reply = None
+    # Telegram trims trailing whitespace, so that is what the user already sees
+    shown = ""
+    pending = 0
+    last_edit = 0.0
+    
+    async for chunk in chunks:
+        text += chunk
+        pending += 1
+        visible = (prefix + text).rstrip()
+        if reply is None:
+            # Telegram rejects empty messages, so wait for visible text before the first reply
+            if not visible.strip():
+                continue
+            reply = await message.reply_text(prefix + text)
+        elif pending >= STREAM_EDIT_CHUNKS or loop.time() - last_edit >= STREAM_EDIT_INTERVAL:
+            # An edit that only adds whitespace would fail with "message is not modified"
+            if visible != shown:
+                try:
+                    await reply.edit_text(prefix + text)
+                except BadRequest as e:
+                    logger.warning(f"Edit of streamed reply failed: {e}")
+                    continue
+        else:
+            continue
+        shown = visible
+        pending = 0
+        last_edit = loop.time()
+    
+    if reply is None:
+        if text:
+            logger.warning("Streamed reply contained only whitespace; nothing was sent")
+        return text
+    
+    if pending or parse_mode:
+        try:
+            await reply.edit_text(prefix + text, parse_mode=parse_mode)
+        except BadRequest as e:
+            # Raised when the text is unchanged or the markup is invalid
+            logger.warning(f"Final edit of streamed reply failed: {e}")
+    return text
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    """
+    Process updates from different chats concurrently, but updates from the same
+    chat one at a time and in the order they arrived. ConversationHandler state is
+    kept per chat and user, so this stops e.g. a double-tapped "Send" button from
+    running an announcement confirmation twice, while one slow AI reply still
+    doesn't hold up other chats.
+    """
+    
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(max_concurrent_updates)
+        # Chat ID -> [lock, number of updates holding or waiting for it]
+        self._chat_locks: Dict[int, List[Any]] = {}
+    
+    async def process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        """Wait for the chat's earlier updates, then take a concurrency slot and process."""
+        key = None
+        if isinstance(update, Update):
+            if update.effective_chat:
+                key = update.effective_chat.id
+            elif update.effective_user:
+                key = update.effective_user.id
+        if key is None:
+            await super().process_update(update, coroutine)
+            return
+        
+        # The chat lock is taken before the shared semaphore, so updates queued
+        # behind one busy chat don't use up slots other chats could run in
+        entry = self._chat_locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                await super().process_update(update, coroutine)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._chat_locks[key]
+    
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        """Await the update's coroutine; ordering is handled by process_update."""
+        await coroutine
+    
+    async def initialize(self) -> None:
+        """Nothing to set up."""
+    
+    async def shutdown(self) -> None:
+        """Nothing to clean up."""
@@ -1,14 +1,46 @@
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
 from dotenv import load_dotenv
 from telegram import Update
-from telegram.ext import Application, CommandHandler, MessageHandler, filters
+from telegram.ext import AIORateLimiter, Application, CommandHandler, MessageHandler, filters
 
 # Load environment variables first to ensure they're available
 load_dotenv()
 
+# Configure logging once for the whole bot, before any bot module is imported
+# so log messages emitted at import time are not lost. Records are handed to a
+# queue and written out by a background thread, keeping console I/O off the
+# event loop during broadcasts.
+_log_queue = queue.SimpleQueue()
+_log_output = logging.StreamHandler()
+_log_output.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_output)
+# The listener's handler does the formatting; without a plain formatter here,
+# basicConfig would give the QueueHandler its default one and prefix every
+# message twice
+_log_enqueue = logging.handlers.QueueHandler(_log_queue)
+_log_enqueue.setFormatter(logging.Formatter("%(message)s"))
+logging.basicConfig(handlers=[_log_enqueue], level=logging.INFO)
+_log_listener.start()
+# Write out any records still queued on every exit path, including early
+# returns and exceptions, before the listener's thread is torn down
+atexit.register(_log_listener.stop)
+# Per-request INFO logs from the HTTP client and PTB would drown out our own
+logging.getLogger("httpx").setLevel(logging.WARNING)
+logging.getLogger("telegram").setLevel(logging.WARNING)
+
 # Import handlers from bot modules
-from bot.handlers import start, help_command, handle_message
+from bot.handlers import (
+    start,
+    help_command,
+    handle_message,
+    greeting_handler,
+    seed_seen_users,
+    GREETING_FILTER
+)
 from bot.commands import (
     announcement_handler, 
     add_admin_handler, 
@@ -19,14 +51,35 @@ from bot.commands import (
 )
 from bot.scheduler import setup_scheduler
 from bot.database import db_manager
+from bot.ai import open_disk_cache, close_ai_client
+from bot.utils import PerChatUpdateProcessor
 
-# Configure logging
-logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", 
-    level=logging.INFO
-)
 logger = logging.getLogger(__name__)
 
+async def post_init(application: Application) -> None:
+    """Connect to the database and set up scheduled tasks once the event loop is running."""
+    # Check database connection
+    logger.info("🔄 Checking database connection...")
+    await db_manager.connect()
+    db_manager.start_message_writer()
+    if not await db_manager.check_connection():
+        logger.error("❌ Database connection failed. Please check your MongoDB URI and credentials.")
+        logger.info("⚠️ Bot will start, but data persistence may not work correctly.")
+    else:
+        logger.info("✅ Database connection successful!")
+        await seed_seen_users()
+    
+    # Open the persistent AI response cache
+    open_disk_cache()
+    
+    # Set up scheduled tasks
+    await setup_scheduler(application)
+
+async def post_shutdown(application: Application) -> None:
+    """Release shared resources once the application has stopped."""
+    await close_ai_client()
+    await db_manager.close()
+
 def main() -> None:
     """Start the bot and set up all handlers and scheduled tasks."""
     # Get the bot token from environment variables
@@ -35,16 +88,28 @@ def main() -> None:
         logger.error("No bot token provided. Set TELEGRAM_BOT_TOKEN in your .env file.")
         return
 
-    # Check database connection
-    logger.info("🔄 Checking database connection...")
-    if not db_manager.check_connection():
-        logger.error("❌ Database connection failed. Please check your MongoDB URI and credentials.")
-        logger.info("⚠️ Bot will start, but data persistence may not work correctly.")
-    else:
-        logger.info("✅ Database connection successful!")
-
-    # Create the Application instance
-    application = Application.builder().token(token).build()
+    # Create the Application instance; database setup and scheduling run in
+    # post_init because the async database client needs the running event loop
+    application = (
+        Application.builder()
+        .token(token)
+        # Reuse TLS connections and multiplex requests over HTTP/2; the pool is
+        # large enough for a broadcast's concurrent sends plus regular traffic.
+        # The getUpdates long poll stays on PTB's default HTTP/1.1, as HTTP/2
+        # is known to be unstable for it when requests get cancelled.
+        .http_version("2")
+        .connection_pool_size(64)
+        .pool_timeout(10.0)
+        # Handle updates from different chats in parallel, so one slow AI reply
+        # doesn't hold up everyone else's messages; each chat's own updates,
+        # including its conversation steps, still run one at a time
+        .concurrent_updates(PerChatUpdateProcessor(32))
+        # Pace every Bot API call, not just broadcasts, and retry on flood waits
+        .rate_limiter(AIORateLimiter(overall_max_rate=30, overall_time_period=1, max_retries=3))
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
 
     # Add command handlers
     application.add_handler(CommandHandler("start", start))
@@ -58,11 +123,11 @@ def main() -> None:
     application.add_handler(list_admins_handler)
     application.add_handler(motivate_handler)  # Add the new motivate handler
     
-    # Add message handler for regular messages
-    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
-    
-    # Set up scheduled tasks
-    setup_scheduler(application)
+    # Add message handlers for greetings and regular messages. Only new messages
+    # are answered; edits and channel posts carry no update.message.
+    chat_text = filters.UpdateType.MESSAGE & filters.TEXT & ~filters.COMMAND
+    application.add_handler(MessageHandler(chat_text & GREETING_FILTER, greeting_handler))
+    application.add_handler(MessageHandler(chat_text & ~GREETING_FILTER, handle_message))
     
     # Start the Bot
     logger.info("🚀 Starting bot...")